@@ -1,72 +1,137 @@
+import asyncio
+import logging
 import os
+import time
+from typing import Optional
 from dotenv import load_dotenv
 
 from livekit import agents
-from livekit.agents import AgentSession, Agent, RoomInputOptions
+from livekit.agents import AgentSession, Agent, ChatContext, RoomInputOptions
 from livekit.plugins import (
     noise_cancellation,
 )
 from livekit.plugins import google
-from prompts import AGENT_INSTRUCTION, SESSION_INSTRUCTION
-from tools import get_weather, search_web, send_email, extract_pdf_text, extract_image_text, get_current_datetime, get_current_events, answer_general_question, get_election_info, tell_short_story, search_youtube, search_music, search_news
+from prompts import SESSION_INSTRUCTION
+from tool_registry import ToolRegistry, build_default_registry
+from memory import MemoryStore, format_memories, user_memory_dir
+from log_pipeline import bind_session, setup_logging, shutdown_logging
+from tools import prefetcher
 
 load_dotenv()
 
+logger = logging.getLogger("roku.agent")
+
 # Set the Google API key as environment variable
 google_api_key = os.getenv("GOOGLE_API_KEY")
 if google_api_key:
     os.environ["GOOGLE_API_KEY"] = google_api_key
-    print(f"Google API Key loaded: {google_api_key[:10]}...")
+    print("Google API Key loaded")
 else:
     print("Warning: GOOGLE_API_KEY not found in environment variables")
 
 
 class Assistant(Agent):
-    def __init__(self) -> None:
+    def __init__(self, registry: Optional[ToolRegistry] = None, memory: Optional[MemoryStore] = None) -> None:
+        # Every tool is always exposed; only the instructions for tools the
+        # conversation hasn't needed lately are shortened (see ToolRegistry)
+        self._registry = registry or build_default_registry()
+        self._memory = memory
+        self._shared_memories: set = set()
+        self._detailed_tools = self._registry.initial_selection()
         super().__init__(
-            instructions=AGENT_INSTRUCTION,
+            instructions=self._registry.instructions_for(self._detailed_tools),
             llm=google.beta.realtime.RealtimeModel(
                 temperature=0.8,
             ),
-            tools=[
-                get_weather,
-                search_web,
-                send_email,
-                extract_pdf_text,
-                extract_image_text,
-                get_current_datetime,
-                get_current_events,
-                answer_general_question,
-                get_election_info,
-                tell_short_story,
-                search_youtube,
-                search_music,
-                search_news,
-            ],
-
+            tools=self._registry.tools(),
+            chat_ctx=self._memory_context(),
         )
-        
+
+    def _memory_context(self) -> Optional[ChatContext]:
+        """Seed the conversation with the user's latest memories, so even the first reply can use them."""
+        if self._memory is None:
+            return None
+        memories = self._memory.recent()
+        if not memories:
+            return None
+        self._shared_memories.update(m["text"] for m in memories)
+        chat_ctx = ChatContext()
+        chat_ctx.add_message(role="system", content=format_memories(memories))
+        return chat_ctx
+
+    async def on_user_turn_completed(self, turn_ctx, new_message) -> None:
+        text = new_message.text_content or ""
+        if self._memory is not None and text:
+            # Recall before remembering so the new message doesn't match itself
+            memories = [m for m in self._memory.recall(text) if m["text"] not in self._shared_memories]
+            self._memory.remember(text, role="user")
+            if memories:
+                # The realtime model already has this turn, so a note added to
+                # turn_ctx wouldn't reach this reply. Adding it to the chat context
+                # makes it available from the next turn on, e.g. for follow-ups.
+                self._shared_memories.update(m["text"] for m in memories)
+                chat_ctx = self.chat_ctx.copy()
+                chat_ctx.add_message(role="system", content=format_memories(memories))
+                await self.update_chat_ctx(chat_ctx)
+
+        # This runs after the turn was handed to the realtime model, so a new
+        # selection only applies from the next turn. That's safe because it only
+        # changes how detailed the instructions are, never which tools exist.
+        # Each update restarts the Gemini session, so small savings are skipped.
+        selection = self._registry.select(text)
+        if not self._registry.should_update(self._detailed_tools, selection):
+            return
+        self._detailed_tools = selection
+        start = time.perf_counter()
+        await self.update_instructions(self._registry.instructions_for(selection))
+        logger.info("Updated realtime instructions in %.0f ms", (time.perf_counter() - start) * 1000)
+        self._registry.log_savings(selection)
 
 
 async def entrypoint(ctx: agents.JobContext):
+    # Tool and agent logs go through a background writer so the audio loop never blocks on I/O
+    setup_logging()
+    bind_session(ctx.room.name or ctx.job.id)
+
+    async def _flush_logs():
+        shutdown_logging()
+
+    ctx.add_shutdown_callback(_flush_logs)
+
     session = AgentSession(
         
     )
 
+    # Keep the most requested weather/news/election lookups warm in the background.
+    # Popularity, cache and budget are shared with the worker's other jobs.
+    prefetcher.start()
+    ctx.add_shutdown_callback(prefetcher.aclose)
+
+    await ctx.connect()
+
+    # Long-term memory lives on local disk, one directory per remote participant
+    participant = await ctx.wait_for_participant()
+    memory = await asyncio.to_thread(
+        MemoryStore,
+        user_memory_dir(os.getenv("ROKU_MEMORY_DIR", ".roku_memory"), participant.identity),
+        quantize=os.getenv("ROKU_MEMORY_QUANTIZE", "").lower() in ("1", "true", "yes"),
+    )
+    ctx.add_shutdown_callback(memory.aclose)
+
     await session.start(
         room=ctx.room,
-        agent=Assistant(),
+        agent=Assistant(memory=memory),
         room_input_options=RoomInputOptions(
             # LiveKit Cloud enhanced noise cancellation
             # - If self-hosting, omit this parameter
             # - For telephony applications, use `BVCTelephony` for best results
             video_enabled=True,
+            # Only listen to the participant whose memories were loaded
+            participant_identity=participant.identity,
             noise_cancellation=noise_cancellation.BVC(),
         ),
     )
 
-    await ctx.connect()
-
     await session.generate_reply(
         instructions=SESSION_INSTRUCTION,
     )
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event-loop stall caused by tool logging under concurrent sessions.
+
+Simulates many sessions whose tool calls log a large search payload, once with
+the old synchronous f-string logging and once through log_pipeline. Reports
+the time the event loop spent inside log calls and the loop lag measured by a
+1 ms ticker task.
+
+    python bench_logging.py --sessions 50 --calls 40 --payload 8000
+    python bench_logging.py --sink-latency-ms 0.2 --sample 0.25
+
+It first checks that secrets and email addresses cut by truncation are still redacted.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from log_pipeline import JsonFormatter, bind_session, setup_logging, shutdown_logging, tool_name_var
+
+
+class _SlowFileHandler(logging.FileHandler):
+    """File handler that also blocks for ``latency`` seconds per record, like a slow terminal or log shipper."""
+
+    def __init__(self, filename: str, latency: float):
+        super().__init__(filename)
+        self.latency = latency
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        if self.latency:
+            time.sleep(self.latency)
+
+
+async def _ticker(stop: asyncio.Event, lags: list) -> None:
+    interval = 0.001
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(time.perf_counter() - start - interval, 0.0))
+
+
+async def _session(index: int, calls: int, payload: str, log_call, spent: list) -> None:
+    bind_session(f"session-{index}")
+    for call in range(calls):
+        tool_name_var.set("search_web")
+        await asyncio.sleep(random.uniform(0, 0.01))  # upstream latency
+        query = f"query {index}-{call}"
+        start = time.perf_counter()
+        log_call(query, payload)
+        spent.append(time.perf_counter() - start)
+
+
+async def _run(sessions: int, calls: int, payload: str, log_call) -> dict:
+    stop = asyncio.Event()
+    lags: list = []
+    spent: list = []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(_session(i, calls, payload, log_call, spent) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    lags.sort()
+    return {
+        "elapsed_s": elapsed,
+        "in_log_calls_ms": sum(spent) * 1000,
+        "lag_p50_ms": lags[len(lags) // 2] * 1000 if lags else 0.0,
+        "lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0,
+        "lag_max_ms": lags[-1] * 1000 if lags else 0.0,
+    }
+
+
+def _check_redaction() -> bool:
+    """Secrets and emails that straddle the truncation point must not leak in part."""
+    key = "AIza" + "B" * 35
+    formatter = JsonFormatter(max_arg_chars=200, secrets=(key,))
+    cases = [
+        ("Results: %s", ("x" * 190 + key,), "AIzaB"),
+        ("Results: %s", ("x" * 190 + "john.doe@example.com",), "john.doe"),
+        ("Results: %s %d", ("x" * 190 + key,), "AIzaB"),  # fallback path (missing argument)
+        ("Token: " + key + " %s", ("ok",), "AIzaB"),
+    ]
+    ok = True
+    for msg, args, leaked in cases:
+        record = logging.LogRecord("roku.bench", logging.INFO, __file__, 0, msg, args, None)
+        if leaked in formatter.format(record):
+            print(f"Redaction FAILED for {msg!r}")
+            ok = False
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--payload", type=int, default=8000, help="characters in each logged search payload")
+    parser.add_argument("--sample", type=float, default=1.0, help="search_web sample rate for the pipeline run")
+    parser.add_argument("--sink-latency-ms", type=float, default=0.0, help="extra blocking time per written record")
+    args = parser.parse_args()
+
+    print(f"Redaction before truncation: {'OK' if _check_redaction() else 'FAILED'}")
+
+    payload = ("Result snippet mentioning someone@example.com and more text. " * (args.payload // 60 + 1))[: args.payload]
+    workdir = tempfile.mkdtemp(prefix="roku-bench-")
+
+    # Baseline: what tools.py used to do
+    sync_logger = logging.getLogger("bench.sync")
+    sync_logger.propagate = False
+    sync_logger.setLevel(logging.INFO)
+    latency = args.sink_latency_ms / 1000
+    handler = _SlowFileHandler(os.path.join(workdir, "sync.log"), latency)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    sync_logger.addHandler(handler)
+
+    def sync_log(query, results):
+        sync_logger.info(f"Search results for '{query}': {results}")
+
+    baseline = asyncio.run(_run(args.sessions, args.calls, payload, sync_log))
+    handler.close()
+
+    pipeline_logger = setup_logging(
+        sample_rates={"search_web": args.sample},
+        handler=_SlowFileHandler(os.path.join(workdir, "pipeline.log"), latency),
+    ).getChild("bench")
+
+    def pipeline_log(query, results):
+        pipeline_logger.info("Search results for '%s': %s", query, results)
+
+    pipelined = asyncio.run(_run(args.sessions, args.calls, payload, pipeline_log))
+    flush_start = time.perf_counter()
+    shutdown_logging()
+    flush_ms = (time.perf_counter() - flush_start) * 1000
+
+    print(f"{args.sessions} sessions x {args.calls} calls, {args.payload}-char payloads (logs in {workdir})")
+    print(f"{'':<16}{'loop time in log calls':>24}{'lag p50':>10}{'lag p99':>10}{'lag max':>10}")
+    for name, result in (("sync f-string", baseline), ("log_pipeline", pipelined)):
+        print(
+            f"{name:<16}{result['in_log_calls_ms']:>21.1f} ms"
+            f"{result['lag_p50_ms']:>7.2f} ms{result['lag_p99_ms']:>7.2f} ms{result['lag_max_ms']:>7.2f} ms"
+        )
+    saved = baseline["in_log_calls_ms"] - pipelined["in_log_calls_ms"]
+    print(f"Event-loop time removed: {saved:.1f} ms (background flush at shutdown: {flush_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+In-memory passage index for follow-up questions about large documents.
+
+A document is extracted once, split into page-numbered paragraphs and indexed
+in an inverted index. Questions are answered with the best-matching passages
+(BM25 ranking) that fit in a character budget, so a question about page 140
+doesn't require re-extracting the document or sending all of it to the model.
+"""
+
+import math
+import re
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by does do for from has have how i in is it its "
+    "me my of on or say says said that the their there this to was were what "
+    "when where which who why will with about tell you your".split()
+)
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+@dataclass
+class Passage:
+    page: int
+    text: str
+    length: int
+
+
+class DocumentIndex:
+    """
+    Inverted index over the paragraphs of one document.
+
+    Paragraphs longer than ``max_passage_chars`` are split on sentence
+    boundaries so a single match never blows the answer budget.
+    """
+
+    def __init__(self, pages: list, max_passage_chars: int = 800, k1: float = 1.2, b: float = 0.75):
+        self.num_pages = len(pages)
+        self.passages: list = []
+        self._postings: dict = defaultdict(list)
+        self._k1 = k1
+        self._b = b
+
+        for page_number, page_text in enumerate(pages, start=1):
+            for paragraph in _PARAGRAPH_RE.split(page_text or ""):
+                for chunk in _split_long(" ".join(paragraph.split()), max_passage_chars):
+                    self._add(page_number, chunk)
+
+        total = sum(p.length for p in self.passages)
+        self._avg_length = total / len(self.passages) if self.passages else 0.0
+
+    def _add(self, page: int, text: str) -> None:
+        terms = tokenize(text)
+        if not terms:
+            return
+        passage_id = len(self.passages)
+        self.passages.append(Passage(page=page, text=text, length=len(terms)))
+        for term, freq in Counter(terms).items():
+            self._postings[term].append((passage_id, freq))
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Return ``(passage_id, score)`` pairs for the best passages, best first."""
+        scores: dict = defaultdict(float)
+        n = len(self.passages)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for passage_id, freq in postings:
+                length = self.passages[passage_id].length
+                norm = freq + self._k1 * (1 - self._b + self._b * length / self._avg_length)
+                scores[passage_id] += idf * freq * (self._k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def answer(self, query: str, max_chars: int = 1500) -> str:
+        """
+        Best-matching passages that fit within ``max_chars``, each prefixed with
+        its page number and returned in document order.
+        """
+        chosen = []
+        used = 0
+        for passage_id, _ in self.search(query):
+            passage = self.passages[passage_id]
+            # "[Page N] " prefix, plus the blank line separating it from the previous entry
+            overhead = len(f"[Page {passage.page}] ") + (2 if chosen else 0)
+            if used + overhead + len(passage.text) > max_chars:
+                if chosen:
+                    continue
+                # Always return at least one (truncated) passage
+                chosen.append((passage_id, passage.text[: max(max_chars - overhead, 0)]))
+                break
+            chosen.append((passage_id, passage.text))
+            used += overhead + len(passage.text)
+        chosen.sort()
+        return "\n\n".join(f"[Page {self.passages[i].page}] {text}" for i, text in chosen)
+
+
+def _split_long(text: str, max_chars: int) -> list:
+    if len(text) <= max_chars:
+        return [text] if text else []
+    chunks = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        while len(sentence) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class DocumentStore:
+    """Keeps the indexes of the most recently used documents, keyed by source."""
+
+    def __init__(self, max_documents: int = 8):
+        self._documents: OrderedDict = OrderedDict()
+        self._max_documents = max_documents
+
+    def get(self, source: str) -> Optional[DocumentIndex]:
+        index = self._documents.get(source)
+        if index is not None:
+            self._documents.move_to_end(source)
+        return index
+
+    def put(self, source: str, index: DocumentIndex) -> None:
+        self._documents[source] = index
+        self._documents.move_to_end(source)
+        while len(self._documents) > self._max_documents:
+            self._documents.popitem(last=False)
+
+    def __contains__(self, source: str) -> bool:
+        return source in self._documents
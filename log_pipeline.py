@@ -0,0 +1,235 @@
+"""
+Non-blocking logging for the tool and agent hot paths.
+
+Log calls on the event-loop thread only build a LogRecord and put it on a
+queue; formatting, redaction and writing happen on a background listener
+thread. Records are:
+
+- sampled per tool (warnings and errors are always kept),
+- formatted lazily, with string arguments truncated to ``max_arg_chars`` and
+  the whole message capped,
+- redacted: email addresses and credential-looking values are masked, and the
+  values of secret environment variables are never written,
+- written as one JSON object per line carrying the session and tool-call IDs.
+
+Use ``logger = logging.getLogger("roku.<module>")`` with %-style arguments
+(``logger.info("Results for '%s': %s", query, results)``) so nothing is
+formatted unless the record survives sampling.
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+session_id_var: contextvars.ContextVar = contextvars.ContextVar("roku_session_id", default=None)
+tool_name_var: contextvars.ContextVar = contextvars.ContextVar("roku_tool_name", default=None)
+tool_call_id_var: contextvars.ContextVar = contextvars.ContextVar("roku_tool_call_id", default=None)
+
+_SECRET_ENV_VARS = (
+    "GOOGLE_API_KEY",
+    "GMAIL_APP_PASSWORD",
+    "LIVEKIT_API_KEY",
+    "LIVEKIT_API_SECRET",
+    "OPENAI_API_KEY",
+)
+
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_CREDENTIAL_RE = re.compile(
+    r"(?i)\b(password|passwd|pwd|secret|token|api[_-]?key|authorization)(\s*[=:]\s*|\s+)(bearer\s+)?[^\s,;'\"]+"
+)
+_KEY_LIKE_RE = re.compile(r"\b(?:AIza[0-9A-Za-z_-]{35}|sk-[0-9A-Za-z_-]{20,}|(?:APIs|API)[0-9A-Za-z]{10,})\b")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_session(session_id: str) -> None:
+    """Tag every record logged from the current context with ``session_id``."""
+    session_id_var.set(session_id)
+
+
+def bind_tool_call(context, tool_name: str) -> None:
+    """
+    Tag records logged during a tool call with the tool name and call ID.
+    Each tool call runs in its own task, so this doesn't leak into other calls.
+    """
+    tool_name_var.set(tool_name)
+    function_call = getattr(context, "function_call", None)
+    tool_call_id_var.set(getattr(function_call, "call_id", None))
+
+
+def redact(text: str, secrets: tuple = ()) -> str:
+    """Mask secret values, credential-looking values and email addresses in ``text``."""
+    for secret in secrets:
+        text = text.replace(secret, "[REDACTED]")
+    text = _CREDENTIAL_RE.sub(lambda m: f"{m.group(1)}{m.group(2)}[REDACTED]", text)
+    text = _KEY_LIKE_RE.sub("[REDACTED]", text)
+    return _EMAIL_RE.sub("[EMAIL]", text)
+
+
+def truncate(value, max_chars: int) -> str:
+    text = value if isinstance(value, str) else str(value)
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [{len(text) - max_chars} more chars]"
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of each tool's INFO/DEBUG records; always keep warnings and errors."""
+
+    def __init__(self, sample_rates: Optional[dict] = None, default_rate: float = 1.0):
+        super().__init__()
+        self.sample_rates = dict(sample_rates or {})
+        self.default_rate = default_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session_id = session_id_var.get()
+        record.tool = tool_name_var.get()
+        record.tool_call_id = tool_call_id_var.get()
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.sample_rates.get(record.tool, self.default_rate)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock ``prepare`` formats the message on the calling thread, which is
+    exactly the work we want off the event loop. Arguments are passed through
+    untouched; callers log immutable values (strings, numbers).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with truncated and redacted message arguments."""
+
+    def __init__(self, max_arg_chars: int = 200, secrets: tuple = ()):
+        super().__init__()
+        self.max_arg_chars = max_arg_chars
+        self.secrets = tuple(s for s in secrets if s)
+
+    def _shorten(self, text: str) -> str:
+        # Redact before truncating: a secret cut in half no longer matches anything
+        return truncate(redact(text, self.secrets), self.max_arg_chars)
+
+    def _prepare_arg(self, arg):
+        # Only strings are shortened so %d, %.2f etc. still get numbers
+        return self._shorten(arg) if isinstance(arg, str) else arg
+
+    def _message(self, record: logging.LogRecord) -> str:
+        msg = str(record.msg)
+        if record.args:
+            args = record.args if isinstance(record.args, tuple) else (record.args,)
+            try:
+                msg = msg % tuple(self._prepare_arg(arg) for arg in args)
+            except (TypeError, ValueError):
+                shown = ", ".join(self._shorten(repr(arg)) for arg in args)
+                msg = f"{msg} ({shown})"
+            # Non-string arguments (exceptions, objects) can still render long
+            limit = self.max_arg_chars * (len(args) + 4)
+        else:
+            limit = self.max_arg_chars * 4
+        # Again on the whole message, for secrets in the format string or in non-string arguments
+        return truncate(redact(msg, self.secrets), limit)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": self._message(record),
+        }
+        for key in ("session_id", "tool", "tool_call_id"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info), self.secrets)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _parse_sample_rates(spec: str) -> dict:
+    """Parse ``"search_web=0.1,search_news=0.25"``."""
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = float(rate)
+        except ValueError:
+            continue
+    return rates
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    sample_rates: Optional[dict] = None,
+    max_arg_chars: int = 200,
+    stream=None,
+    filename: Optional[str] = None,
+    handler: Optional[logging.Handler] = None,
+) -> logging.Logger:
+    """
+    Route the ``roku`` logger hierarchy through the background pipeline.
+
+    Sample rates default to ``ROKU_LOG_SAMPLE`` (e.g. ``search_web=0.1``) and the
+    output file to ``ROKU_LOG_FILE`` (stderr if unset). A custom output ``handler``
+    can be passed instead; it is given the JSON formatter. Safe to call more than once.
+    """
+    global _listener
+
+    logger = logging.getLogger("roku")
+    if _listener is not None:
+        return logger
+
+    if sample_rates is None:
+        sample_rates = _parse_sample_rates(os.getenv("ROKU_LOG_SAMPLE", ""))
+    if stream is None:
+        filename = filename or os.getenv("ROKU_LOG_FILE")
+
+    if handler is not None:
+        output = handler
+    elif filename:
+        output = logging.FileHandler(filename, encoding="utf-8")
+    else:
+        output = logging.StreamHandler(stream or sys.stderr)
+    secrets = tuple(os.getenv(name, "") for name in _SECRET_ENV_VARS)
+    output.setFormatter(JsonFormatter(max_arg_chars=max_arg_chars, secrets=secrets))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    return logger
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    logger = logging.getLogger("roku")
+    for handler in list(logger.handlers):
+        if isinstance(handler, _DeferredQueueHandler):
+            logger.removeHandler(handler)
+    _listener = None
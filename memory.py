@@ -0,0 +1,273 @@
+"""
+Local long-term memory for Roku.
+
+Memories are embedded and kept in an in-process NumPy index so recall takes a
+few milliseconds and never leaves the machine. New memories are searchable
+immediately; persisting them to disk happens in batches on a background thread
+so a conversation turn never waits on file I/O.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+import zlib
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger("roku.memory")
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbedder:
+    """
+    Offline stand-in for a sentence embedding model.
+
+    Words and word bigrams are hashed into a fixed number of buckets and the
+    result is L2-normalised, so texts that share vocabulary end up close
+    together. crc32 is used instead of ``hash()`` so vectors are stable across
+    processes and can be persisted.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def __call__(self, texts: list) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _TOKEN_RE.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class VectorIndex:
+    """
+    Growable in-memory index of normalised vectors searched by dot product.
+
+    Storage grows by doubling so inserts are amortised O(1). With
+    ``quantize=True`` vectors are kept as int8 with a per-row scale, which uses
+    a quarter of the memory of float32 at a small cost in recall precision.
+    """
+
+    def __init__(self, dim: int, quantize: bool = False, initial_capacity: int = 256):
+        self.dim = dim
+        self.quantize = quantize
+        self._size = 0
+        dtype = np.int8 if quantize else np.float32
+        self._data = np.zeros((initial_capacity, dim), dtype=dtype)
+        self._scales = np.ones(initial_capacity, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self._data[: self._size].nbytes + (self._scales[: self._size].nbytes if self.quantize else 0)
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._data)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        data = np.zeros((capacity, self.dim), dtype=self._data.dtype)
+        data[: self._size] = self._data[: self._size]
+        scales = np.ones(capacity, dtype=np.float32)
+        scales[: self._size] = self._scales[: self._size]
+        self._data, self._scales = data, scales
+
+    def add(self, vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        count = len(vectors)
+        self._grow(self._size + count)
+        rows = slice(self._size, self._size + count)
+        if self.quantize:
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._data[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._scales[rows] = scales
+        else:
+            self._data[rows] = vectors
+        self._size += count
+
+    def search(self, query: np.ndarray, k: int = 5) -> list:
+        """Return up to ``k`` ``(row, score)`` pairs, best first."""
+        if self._size == 0 or k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        scores = self._data[: self._size] @ query
+        if self.quantize:
+            scores = scores * self._scales[: self._size]
+        k = min(k, self._size)
+        top = np.argpartition(-scores, k - 1)[:k] if k < self._size else np.arange(self._size)
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class MemoryStore:
+    """
+    A user's long-term memories: an index plus the texts it points to.
+
+    ``remember`` updates the index synchronously and hands the record to a
+    background writer that appends batches to this store's own segment,
+    ``memories-<id>.jsonl`` and ``vectors-<id>.f32`` under ``directory``.
+    Each process writes only its own segment and reads all of them, so
+    concurrent sessions of the same user never interleave writes in one file.
+    Call ``close`` to flush on shutdown.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embedder: Optional[Callable] = None,
+        quantize: bool = False,
+        batch_size: int = 16,
+        flush_interval: float = 2.0,
+    ):
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        self.index = VectorIndex(self.embedder.dim, quantize=quantize)
+        self.records: list = []
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._pending: queue.Queue = queue.Queue()
+        self._closed = False
+
+        os.makedirs(directory, exist_ok=True)
+        segment = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._texts_path = os.path.join(directory, f"memories-{segment}.jsonl")
+        self._vectors_path = os.path.join(directory, f"vectors-{segment}.f32")
+        self._load()
+
+        self._writer = threading.Thread(target=self._write_loop, name="memory-writer", daemon=True)
+        self._writer.start()
+
+    def _load(self) -> None:
+        loaded = 0
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("memories-") and name.endswith(".jsonl")):
+                continue
+            segment = name[len("memories-") : -len(".jsonl")]
+            texts_path = os.path.join(self.directory, name)
+            vectors_path = os.path.join(self.directory, f"vectors-{segment}.f32")
+            if not os.path.exists(vectors_path):
+                continue
+            try:
+                records = []
+                with open(texts_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            # A crash mid-append leaves a torn last line; keep what came before
+                            logger.warning("Ignoring the tail of memory segment '%s' after line %s", texts_path, len(records))
+                            break
+                vectors = np.fromfile(vectors_path, dtype=np.float32)
+                vectors = vectors[: len(vectors) - len(vectors) % self.index.dim].reshape(-1, self.index.dim)
+                # A crash between the two appends can leave a segment's files out of
+                # step; they have a single writer, so the common prefix is consistent.
+                count = min(len(records), len(vectors))
+                self.records.extend(records[:count])
+                self.index.add(vectors[:count])
+                loaded += count
+            except Exception as e:
+                logger.error("Error loading memory segment '%s': %s", texts_path, e)
+        if loaded:
+            logger.info("Loaded %s memories from '%s'", loaded, self.directory)
+
+    def remember(self, text: str, **metadata) -> None:
+        """Add a memory. It is searchable immediately and persisted in the background."""
+        text = text.strip()
+        if not text or self._closed:
+            return
+        vector = self.embedder([text])[0]
+        record = {"text": text, "ts": time.time(), **metadata}
+        self.index.add(vector)
+        self.records.append(record)
+        self._pending.put((record, vector))
+
+    def recall(self, query: str, k: int = 3, min_score: float = 0.2) -> list:
+        """Return up to ``k`` memory records most similar to ``query``."""
+        if not query.strip() or len(self.index) == 0:
+            return []
+        vector = self.embedder([query])[0]
+        return [
+            {**self.records[row], "score": score}
+            for row, score in self.index.search(vector, k)
+            if score >= min_score
+        ]
+
+    def recent(self, n: int = 5) -> list:
+        """Return the ``n`` most recent memory records, oldest first."""
+        if n <= 0:
+            return []
+        return sorted(self.records, key=lambda record: record.get("ts", 0))[-n:]
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = []
+            try:
+                item = self._pending.get(timeout=self._flush_interval)
+                if item is None:
+                    return
+                batch.append(item)
+                while len(batch) < self._batch_size:
+                    item = self._pending.get_nowait()
+                    if item is None:
+                        self._write(batch)
+                        return
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: list) -> None:
+        try:
+            with open(self._texts_path, "a", encoding="utf-8") as f:
+                for record, _ in batch:
+                    f.write(json.dumps(record) + "\n")
+            with open(self._vectors_path, "ab") as f:
+                np.stack([vector for _, vector in batch]).astype(np.float32).tofile(f)
+        except Exception as e:
+            logger.error("Error persisting %s memories to '%s': %s", len(batch), self.directory, e)
+
+    def close(self) -> None:
+        """Flush pending writes and stop the background writer."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.put(None)
+        self._writer.join()
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self.close)
+
+
+def user_memory_dir(root: str, user_id: str) -> str:
+    """Directory for one user's memories; the hash keeps distinct ids apart after sanitising."""
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)[:64] or "user"
+    digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:10]
+    return os.path.join(root, f"{safe}-{digest}")
+
+
+def format_memories(memories: list) -> str:
+    """Render recalled memories as a short context note for the model."""
+    lines = [f"- {m['text']}" for m in memories]
+    return "Things the user told you in earlier conversations:\n" + "\n".join(lines)
@@ -0,0 +1,554 @@
+"""
+Background prefetching for popular upstream queries.
+
+A handful of queries (weather for a few cities, "latest news", election
+searches) make up most tool calls. Tools fetch upstream data through a
+``PrefetchScheduler``, which caches results for a short TTL, learns the hot
+keys from recent call frequency and refreshes them in the background before
+they expire, so hot queries are answered warm.
+
+Each job runs in its own process, so the cache, call statistics, request
+budget and rate limits live in a ``PrefetchStore`` (an SQLite file) shared by
+every job on the machine: a key asked once in each of two conversations is as
+hot as one asked twice in the same conversation, and the budget is spent once
+per worker rather than once per job. A lease makes sure only one process
+refreshes a given key.
+
+Background refreshes are jittered, limited per upstream by a token bucket and
+capped overall by an hourly request budget. Live calls are never blocked by
+either limit, but they do count against the upstream's rate.
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger("roku.prefetch")
+
+_COUNTERS = (
+    "calls",
+    "hits",
+    "prefetch_hits",
+    "misses",
+    "coalesced",
+    "prefetch_requests",
+    "prefetch_errors",
+    "budget_exhausted",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    refresh_after REAL NOT NULL,
+    prefetched INTEGER NOT NULL,
+    PRIMARY KEY (source, key)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    arg TEXT NOT NULL,
+    score REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (source, key)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (source, key)
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    source TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS spent (ts REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class TokenBucket:
+    """Allows ``rate_per_minute`` requests per minute with bursts up to ``burst``."""
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: Optional[int] = None,
+        tokens: Optional[float] = None,
+        updated: Optional[float] = None,
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(int(rate_per_minute // 6), 1))
+        self.tokens = self.capacity if tokens is None else tokens
+        self.updated = time.time() if updated is None else updated
+
+    def _refill(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + max(now - self.updated, 0.0) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, now: Optional[float] = None) -> bool:
+        self._refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def consume(self, now: Optional[float] = None) -> None:
+        """Record a request that has to happen anyway (may leave the bucket in debt)."""
+        self._refill(now)
+        self.tokens -= 1
+
+
+@dataclass
+class Source:
+    name: str
+    fetch: Callable[[str], Awaitable[str]]
+    ttl: float
+    rate_per_minute: float
+    burst: Optional[int] = None
+
+
+def _normalize(arg: str) -> str:
+    # Case is kept: upstream text echoes the argument ("Weather in Paris"), so
+    # "paris" and "Paris" must not share a cached value
+    return " ".join(arg.split())
+
+
+class PrefetchStore:
+    """
+    Cache, call statistics, budget and rate limits shared between processes.
+
+    Backed by an SQLite file in WAL mode; ``":memory:"`` keeps everything in
+    this process. Every method does blocking I/O, so call them off the event
+    loop (the scheduler uses ``asyncio.to_thread``). Times are wall-clock
+    seconds so they compare across processes.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross a fork, so each process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], object]):
+        """Run ``work`` in a write transaction, so read-modify-write steps are atomic across processes."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, name: str, amount: int = 1) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    @staticmethod
+    def _bucket(conn: sqlite3.Connection, src: Source, now: float) -> TokenBucket:
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE source = ?", (src.name,)).fetchone()
+        if row is None:
+            return TokenBucket(src.rate_per_minute, src.burst, updated=now)
+        return TokenBucket(src.rate_per_minute, src.burst, tokens=row[0], updated=row[1])
+
+    @staticmethod
+    def _save_bucket(conn: sqlite3.Connection, src: Source, bucket: TokenBucket) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (source, tokens, updated) VALUES (?, ?, ?)",
+            (src.name, bucket.tokens, bucket.updated),
+        )
+
+    def bump(self, name: str, amount: int = 1) -> None:
+        self._transaction(lambda conn: self._bump(conn, name, amount))
+
+    def lookup(self, src: Source, key: str, now: float) -> tuple:
+        """
+        ``(value, prefetched)`` for a fresh cache entry, else ``(None, False)``.
+        A plain read: in WAL mode it never waits for writers.
+        """
+        with self._lock:
+            entry = self._connection().execute(
+                "SELECT value, fetched_at, prefetched FROM cache WHERE source = ? AND key = ?", (src.name, key)
+            ).fetchone()
+        if entry is not None and now - entry[1] < src.ttl:
+            return entry[0], bool(entry[2])
+        return None, False
+
+    def record_call(self, src: Source, key: str, arg: str, now: float, half_life: float, outcome: str) -> None:
+        """Add a call to ``key``'s popularity score and count it as a hit, prefetch hit or miss."""
+
+        def work(conn):
+            row = conn.execute(
+                "SELECT score, updated FROM stats WHERE source = ? AND key = ?", (src.name, key)
+            ).fetchone()
+            score = 1.0
+            if row is not None:
+                score += row[0] * math.exp(-max(now - row[1], 0.0) * math.log(2) / half_life)
+            conn.execute(
+                "INSERT OR REPLACE INTO stats (source, key, arg, score, updated) VALUES (?, ?, ?, ?, ?)",
+                (src.name, key, arg, score, now),
+            )
+            self._bump(conn, "calls")
+            if outcome == "miss":
+                self._bump(conn, "misses")
+            else:
+                self._bump(conn, "hits")
+                if outcome == "prefetch_hit":
+                    self._bump(conn, "prefetch_hits")
+
+        self._transaction(work)
+
+    def put(self, src: Source, key: str, value: str, now: float, refresh_after: float, prefetched: bool) -> None:
+        """Cache a fetched value and release the refresh lease on ``key``."""
+
+        def work(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (source, key, value, fetched_at, refresh_after, prefetched) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (src.name, key, value, now, refresh_after, int(prefetched)),
+            )
+            conn.execute("DELETE FROM leases WHERE source = ? AND key = ?", (src.name, key))
+            if not prefetched:
+                # Live calls count against the upstream's rate (a refresh took its token up front)
+                bucket = self._bucket(conn, src, now)
+                bucket.consume(now)
+                self._save_bucket(conn, src, bucket)
+
+        self._transaction(work)
+
+    def release(self, source: str, key: str) -> None:
+        """Give up the refresh lease on ``key`` (after a failed refresh)."""
+        self._transaction(
+            lambda conn: conn.execute("DELETE FROM leases WHERE source = ? AND key = ?", (source, key))
+        )
+
+    def hot_keys(self, now: float, half_life: float, min_score: float, limit: int) -> list:
+        """
+        ``(source, key, arg)`` for the keys requested often enough recently to
+        keep warm, hottest first. Also forgets keys that have cooled down
+        completely, expired leases and budget entries older than an hour.
+        """
+
+        def work(conn):
+            decay = math.log(2) / half_life
+            hot, cold = [], []
+            for source, key, arg, score, updated in conn.execute(
+                "SELECT source, key, arg, score, updated FROM stats"
+            ).fetchall():
+                score *= math.exp(-max(now - updated, 0.0) * decay)
+                if score < 0.05:
+                    cold.append((source, key))
+                elif score >= min_score:
+                    hot.append((score, source, key, arg))
+            conn.executemany("DELETE FROM stats WHERE source = ? AND key = ?", cold)
+            conn.executemany("DELETE FROM cache WHERE source = ? AND key = ?", cold)
+            conn.execute("DELETE FROM leases WHERE expires < ?", (now,))
+            conn.execute("DELETE FROM spent WHERE ts < ?", (now - 3600,))
+            return hot
+
+        hot = sorted(self._transaction(work), reverse=True)
+        return [(source, key, arg) for _, source, key, arg in hot[:limit]]
+
+    def claim_refreshes(self, candidates: list, now: float, budget_per_hour: int, lease: float) -> list:
+        """
+        Claim the due, unleased ``(src, key, arg)`` candidates this process should
+        refresh, spending one unit of the hourly budget and one token of the
+        upstream's bucket for each. Stops at the first one the budget can't cover.
+        """
+
+        def work(conn):
+            claimed = []
+            buckets = {}
+            spent = conn.execute("SELECT COUNT(*) FROM spent WHERE ts >= ?", (now - 3600,)).fetchone()[0]
+            for src, key, arg in candidates:
+                entry = conn.execute(
+                    "SELECT refresh_after FROM cache WHERE source = ? AND key = ?", (src.name, key)
+                ).fetchone()
+                if entry is not None and now < entry[0]:
+                    continue
+                held = conn.execute(
+                    "SELECT 1 FROM leases WHERE source = ? AND key = ? AND expires >= ?", (src.name, key, now)
+                ).fetchone()
+                if held is not None:
+                    continue
+                if spent >= budget_per_hour:
+                    self._bump(conn, "budget_exhausted")
+                    break
+                if src.name not in buckets:
+                    buckets[src.name] = (src, self._bucket(conn, src, now))
+                if not buckets[src.name][1].try_acquire(now):
+                    continue
+                spent += 1
+                conn.execute("INSERT INTO spent (ts) VALUES (?)", (now,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (source, key, expires) VALUES (?, ?, ?)",
+                    (src.name, key, now + lease),
+                )
+                self._bump(conn, "prefetch_requests")
+                claimed.append((src, key, arg))
+            for src, bucket in buckets.values():
+                self._save_bucket(conn, src, bucket)
+            return claimed
+
+        return self._transaction(work)
+
+    def metrics(self, now: float, budget_per_hour: int) -> dict:
+        def work(conn):
+            counters = dict.fromkeys(_COUNTERS, 0)
+            counters.update(conn.execute("SELECT name, value FROM counters").fetchall())
+            spent = conn.execute("SELECT COUNT(*) FROM spent WHERE ts >= ?", (now - 3600,)).fetchone()[0]
+            return counters, spent
+
+        counters, spent = self._transaction(work)
+        calls = counters["calls"]
+        return {
+            **counters,
+            "hit_rate": counters["hits"] / calls if calls else 0.0,
+            "prefetch_hit_rate": counters["prefetch_hits"] / calls if calls else 0.0,
+            "budget_spent_last_hour": spent,
+            "budget_remaining": max(budget_per_hour - spent, 0),
+        }
+
+    def close(self) -> None:
+        """Close this process's connection; the next call reopens it."""
+        if self.path == ":memory:":
+            # The data only lives in the connection
+            return
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class PrefetchScheduler:
+    """
+    TTL cache for upstream fetches that keeps the most requested keys warm.
+
+    Call ``register`` for each upstream, ``fetch`` from tools, and ``start``
+    once an event loop is running to enable background refreshes. Without
+    ``start`` it is a plain TTL cache. Schedulers in different processes that
+    use the same ``path`` share one cache, one set of call statistics and one
+    budget; with the default ``":memory:"`` everything stays in this process.
+
+    A call adds 1 to its key's score, which halves every ``half_life`` seconds;
+    the default ``min_score`` makes a key hot once it is asked twice within a
+    half-life.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        budget_per_hour: int = 120,
+        half_life: float = 1800.0,
+        min_score: float = 1.5,
+        max_hot_keys: int = 20,
+        tick: float = 5.0,
+        jitter: float = 3.0,
+        lease: float = 60.0,
+        metrics_interval: float = 300.0,
+    ):
+        self.store = PrefetchStore(path)
+        self.budget_per_hour = budget_per_hour
+        self.half_life = half_life
+        self.min_score = min_score
+        self.max_hot_keys = max_hot_keys
+        self.tick = tick
+        self.jitter = jitter
+        self.lease = lease
+        self.metrics_interval = metrics_interval
+
+        self._sources: dict = {}
+        # One upstream fetch per key at a time in this process; concurrent misses await the same task
+        self._pending: dict = {}
+        self._refresh_tasks: set = set()
+        # Bookkeeping writes that tool calls don't wait for
+        self._background: set = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def register(
+        self,
+        name: str,
+        fetch: Callable[[str], Awaitable[str]],
+        ttl: float,
+        rate_per_minute: float,
+        burst: Optional[int] = None,
+    ) -> None:
+        self._sources[name] = Source(name=name, fetch=fetch, ttl=ttl, rate_per_minute=rate_per_minute, burst=burst)
+
+    async def fetch(self, source: str, arg: str) -> str:
+        """Return a fresh cached value for ``arg`` or fetch it live. Errors are not cached."""
+        src = self._sources[source]
+        key = _normalize(arg)
+        now = time.time()
+        try:
+            value, prefetched = await asyncio.to_thread(self.store.lookup, src, key, now)
+        except sqlite3.Error as e:
+            # The shared store is only an optimisation; fall back to a live call
+            logger.warning("Prefetch cache lookup for %s '%s' failed: %s", source, key, e)
+            value, prefetched = None, False
+        if value is None:
+            outcome = "miss"
+        else:
+            outcome = "prefetch_hit" if prefetched else "hit"
+        self._in_background(self.store.record_call, src, key, arg, now, self.half_life, outcome)
+        if value is not None:
+            return value
+        return await self._load(src, key, arg, prefetched=False)
+
+    async def _load(self, src: Source, key: str, arg: str, prefetched: bool) -> str:
+        task = self._pending.get((src.name, key))
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(src, key, arg, prefetched))
+            self._pending[(src.name, key)] = task
+            task.add_done_callback(functools.partial(self._load_done, (src.name, key)))
+        else:
+            self._in_background(self.store.bump, "coalesced")
+        # Shielded so a caller that gives up doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _load_done(self, pending_key: tuple, task: asyncio.Task) -> None:
+        if self._pending.get(pending_key) is task:
+            del self._pending[pending_key]
+        if not task.cancelled():
+            # The waiters re-raise it; this only stops "exception never retrieved" noise
+            task.exception()
+
+    async def _fetch_and_store(self, src: Source, key: str, arg: str, prefetched: bool) -> str:
+        value = await src.fetch(arg)
+        now = time.time()
+        # Jitter the refresh point so keys fetched together don't all refresh together
+        refresh_after = now + src.ttl * random.uniform(0.6, 0.85)
+        if not prefetched:
+            # A live caller shouldn't wait on other processes' writes to get its answer
+            self._in_background(self.store.put, src, key, value, now, refresh_after, prefetched)
+            return value
+        try:
+            await asyncio.to_thread(self.store.put, src, key, value, now, refresh_after, prefetched)
+        except sqlite3.Error as e:
+            logger.warning("Could not cache %s '%s': %s", src.name, key, e)
+        return value
+
+    def _in_background(self, func: Callable, *args) -> None:
+        """Run a store write off the event loop without making the caller wait for it."""
+        task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Prefetch bookkeeping failed: %s", task.exception())
+
+    def hot_keys(self) -> list:
+        """``(source, key)`` pairs requested often enough recently to be worth keeping warm, hottest first."""
+        hot = self.store.hot_keys(time.time(), self.half_life, self.min_score, self.max_hot_keys)
+        return [(source, key) for source, key, _ in hot]
+
+    async def _refresh(self, src: Source, key: str, arg: str, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+            await self._load(src, key, arg, prefetched=True)
+            logger.info("Prefetched %s '%s'", src.name, key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Prefetch of %s '%s' failed: %s", src.name, key, e)
+            self._in_background(self.store.bump, "prefetch_errors")
+            try:
+                await asyncio.to_thread(self.store.release, src.name, key)
+            except sqlite3.Error:
+                pass
+
+    async def _schedule_refreshes(self) -> None:
+        now = time.time()
+        hot = await asyncio.to_thread(self.store.hot_keys, now, self.half_life, self.min_score, self.max_hot_keys)
+        # Skip upstreams this process doesn't know and keys it is already fetching
+        candidates = [
+            (self._sources[source], key, arg)
+            for source, key, arg in hot
+            if source in self._sources and (source, key) not in self._pending
+        ]
+        if not candidates:
+            return
+        claimed = await asyncio.to_thread(self.store.claim_refreshes, candidates, now, self.budget_per_hour, self.lease)
+        for src, key, arg in claimed:
+            task = asyncio.create_task(self._refresh(src, key, arg, random.uniform(0, self.jitter)))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _run(self) -> None:
+        last_report = time.monotonic()
+        while True:
+            await asyncio.sleep(self.tick + random.uniform(0, self.jitter))
+            try:
+                await self._schedule_refreshes()
+                if time.monotonic() - last_report >= self.metrics_interval:
+                    last_report = time.monotonic()
+                    logger.info("Prefetch metrics: %s", await asyncio.to_thread(self.metrics))
+            except Exception as e:
+                logger.error("Error scheduling prefetches: %s", e)
+
+    def start(self) -> None:
+        """Start background refreshes on the running event loop. Safe to call more than once."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def aclose(self) -> None:
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        await asyncio.gather(*self._refresh_tasks, return_exceptions=True)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.gather(*self._background, return_exceptions=True)
+        try:
+            logger.info("Prefetch metrics: %s", await asyncio.to_thread(self.metrics))
+        except sqlite3.Error as e:
+            logger.warning("Could not read prefetch metrics: %s", e)
+        await asyncio.to_thread(self.store.close)
+
+    def metrics(self) -> dict:
+        """Counters for every process sharing the store. Blocking; call it off the event loop."""
+        return {
+            **self.store.metrics(time.time(), self.budget_per_hour),
+            "hot_keys": len(self.hot_keys()),
+        }
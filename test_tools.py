@@ -6,11 +6,17 @@ Test script for Roku Jarvis tools
 import asyncio
 import sys
 import os
+import tempfile
 
 # Add the current directory to the path so we can import our tools
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from tools import get_current_datetime, get_basic_knowledge, get_election_info
+from tools import get_current_datetime, get_election_info
+from tools import _Budget, _BudgetExceeded, _detect_document_type, _fair_shares, _read_source_bytes
+from tool_registry import build_default_registry
+from memory import MemoryStore
+from document_index import DocumentIndex
+from prefetch import PrefetchScheduler
 
 async def test_tools():
     """Test the new tools to ensure they work correctly"""
@@ -26,24 +32,33 @@ async def test_tools():
     except Exception as e:
         print(f"Error: {e}")
     
-    # Test basic knowledge tool
-    print("\n2. Testing get_basic_knowledge:")
-    test_questions = [
+    # Test per-turn tool selection
+    print("\n2. Testing tool registry selection:")
+    registry = build_default_registry()
+    full_cost = registry.cost()
+    test_messages = [
         "What's your name?",
-        "How are you?",
-        "What can you do?",
-        "Hello",
-        "What day is it?"
+        "What's the weather in Paris?",
+        "Who won the presidential election?",
+        "Play me a song by Queen",
+        "Tell me a joke",
+        "Please email my boss",
     ]
-    
-    for question in test_questions:
+
+    for message in test_messages:
         try:
-            result = await get_basic_knowledge(None, question)
-            print(f"Q: {question}")
-            print(f"A: {result}")
+            selection = registry.select(message)
+            cost = registry.cost(selection)
+            print(f"Q: {message}")
+            print(f"Full instructions: {', '.join(selection)}")
+            print(f"Prompt tokens: ~{cost['total_tokens']} (all tools: ~{full_cost['total_tokens']})")
             print()
         except Exception as e:
-            print(f"Error with '{question}': {e}")
+            print(f"Error with '{message}': {e}")
+    # Pruning only shortens instructions; every tool and its rule must stay available
+    instructions = registry.instructions_for(selection)
+    ok = len(registry.tools()) == len(registry.names) and all(f"`{name}`" in instructions for name in registry.names)
+    print(f"All tools still routable: {'OK' if ok else 'FAILED'}")
     
     # Test election info tool
     print("\n3. Testing get_election_info:")
@@ -62,6 +77,130 @@ async def test_tools():
         except Exception as e:
             print(f"Error with '{election}': {e}")
     
+    # Test long-term memory with the offline embedder
+    print("\n4. Testing MemoryStore:")
+    for quantize in (False, True):
+        try:
+            with tempfile.TemporaryDirectory() as memory_dir:
+                memory = MemoryStore(memory_dir, quantize=quantize)
+                memory.remember("My favorite color is green")
+                memory.remember("I live in Berlin with my dog Max")
+                recalled = memory.recall("What is my favorite color?")
+                memory.close()
+
+                reopened = MemoryStore(memory_dir, quantize=quantize)
+                reloaded = reopened.recall("Where does my dog live?")
+                reopened.close()
+
+            ok = (
+                bool(recalled) and recalled[0]["text"] == "My favorite color is green"
+                and bool(reloaded) and reloaded[0]["text"] == "I live in Berlin with my dog Max"
+            )
+            print(f"quantize={quantize}: {'OK' if ok else 'FAILED'}")
+            print(f"Recalled: {[m['text'] for m in recalled]}")
+            print(f"After reopening: {[m['text'] for m in reloaded]}")
+        except Exception as e:
+            print(f"Error with quantize={quantize}: {e}")
+
+    # A line torn by a crash must only drop that line, not the whole segment
+    try:
+        with tempfile.TemporaryDirectory() as memory_dir:
+            memory = MemoryStore(memory_dir)
+            for i in range(5):
+                memory.remember(f"Note number {i}")
+            memory.close()
+            segment = [name for name in os.listdir(memory_dir) if name.startswith("memories-")][0]
+            with open(os.path.join(memory_dir, segment), "a", encoding="utf-8") as f:
+                f.write('{"text": "half writ')
+            reopened = MemoryStore(memory_dir)
+            count = len(reopened.records)
+            reopened.close()
+        print(f"Torn segment: {'OK' if count == 5 else 'FAILED'} ({count} of 5 memories kept)")
+    except Exception as e:
+        print(f"Error with torn segment: {e}")
+
+    # Test the document page index
+    print("\n5. Testing DocumentIndex:")
+    try:
+        pages = [f"Page {n} covers routine operations and staffing." for n in range(1, 150)]
+        pages[139] = "Revenue grew by 12 percent, driven by subscriptions.\n\nCosts stayed flat."
+        pages[119] = "Revenue from hardware declined slightly this year."
+        index = DocumentIndex(pages)
+        answer = index.answer("What does it say about revenue?", max_chars=130)
+        ok = answer.startswith("[Page 120]") and "[Page 140]" in answer and len(answer) <= 130
+        print(f"Passages: {'OK' if ok else 'FAILED'} ({len(answer)} chars)")
+        print(answer)
+        short = index.answer("revenue subscriptions", max_chars=30)
+        print(f"Budget: {'OK' if short.startswith('[Page 140]') and len(short) <= 30 else 'FAILED'}")
+        print(f"No match: {'OK' if index.answer('dinosaurs') == '' else 'FAILED'}")
+    except Exception as e:
+        print(f"Error with DocumentIndex: {e}")
+
+    # Test the batch extraction helpers (no network or OCR needed)
+    print("\n6. Testing extract_documents helpers:")
+    try:
+        shares = _fair_shares([100, 20000, 500], 8000)
+        print(f"Fair shares: {'OK' if shares == [100, 7400, 500] else 'FAILED'} {shares}")
+
+        samples = {
+            b"%PDF-1.7 ...": "pdf",
+            b"\x89PNG\r\n\x1a\n....": "image",
+            b"BM" + (70).to_bytes(4, "little") + bytes(8) + (40).to_bytes(4, "little"): "image",
+            b"BMW owners manual": None,
+            b"plain text": None,
+        }
+        detected = {data[:12]: _detect_document_type(data) for data in samples}
+        ok = all(_detect_document_type(data) == kind for data, kind in samples.items())
+        print(f"Type detection: {'OK' if ok else 'FAILED'} {detected}")
+
+        with tempfile.TemporaryDirectory() as batch_dir:
+            path = os.path.join(batch_dir, "big.pdf")
+            with open(path, "wb") as f:
+                f.write(b"%PDF-" + bytes(1000))
+            budget = _Budget(1500)
+            await _read_source_bytes(path, budget)
+            try:
+                await _read_source_bytes(path, budget)
+                over_budget = False
+            except _BudgetExceeded:
+                over_budget = True
+        print(f"Byte budget: {'OK' if over_budget and budget.remaining == 495 else 'FAILED'}")
+    except Exception as e:
+        print(f"Error with extract_documents helpers: {e}")
+
+    # Test the prefetch scheduler against a stub upstream
+    print("\n7. Testing PrefetchScheduler:")
+    try:
+        upstream_calls = []
+
+        async def fake_weather(city):
+            upstream_calls.append(city)
+            await asyncio.sleep(0.05)
+            return f"Weather in {city}: sunny"
+
+        prefetcher = PrefetchScheduler(budget_per_hour=1, tick=0.05, jitter=0.01)
+        prefetcher.register("weather", fake_weather, ttl=0.5, rate_per_minute=600, burst=10)
+
+        results = await asyncio.gather(*(prefetcher.fetch("weather", "Paris") for _ in range(5)))
+        print(f"Concurrent misses share one fetch: {'OK' if len(upstream_calls) == 1 and len(set(results)) == 1 else 'FAILED'}")
+        await prefetcher.fetch("weather", "Paris")
+
+        prefetcher.start()
+        await asyncio.sleep(0.65)
+        refreshed = await prefetcher.fetch("weather", "Paris")
+        print(f"Hot key refreshed in the background: {'OK' if len(upstream_calls) == 2 else 'FAILED'}")
+        print(f"Cached value keeps the caller's spelling: {'OK' if refreshed == 'Weather in Paris: sunny' else 'FAILED'}")
+
+        await asyncio.sleep(0.8)
+        await prefetcher.aclose()
+        metrics = await asyncio.to_thread(prefetcher.metrics)
+        ok = len(upstream_calls) == 2 and metrics["budget_exhausted"] > 0 and metrics["budget_remaining"] == 0
+        print(f"Budget stops further refreshes: {'OK' if ok else 'FAILED'}")
+        ok = metrics["calls"] == 7 and metrics["hit_rate"] == 2 / 7 and metrics["prefetch_hit_rate"] == 1 / 7
+        print(f"Metrics: {'OK' if ok else 'FAILED'} (hit rate {metrics['hit_rate']:.2f}, prefetch hit rate {metrics['prefetch_hit_rate']:.2f})")
+    except Exception as e:
+        print(f"Error with PrefetchScheduler: {e}")
+
     print("=" * 50)
     print("Testing complete!")
 
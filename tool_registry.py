@@ -0,0 +1,215 @@
+"""
+Per-turn tool selection for the realtime agent.
+
+Every tool schema and routing rule sent to the model costs input tokens on
+every turn. The registry keeps track of all tools, estimates their token cost,
+and uses a cheap keyword classifier to keep full routing rules, response
+styles and examples only for the tools relevant to the current conversation;
+the others get compact one-line rules.
+"""
+
+import inspect
+import logging
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from prompts import build_agent_instruction
+
+logger = logging.getLogger("roku.agent")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+
+def _tool_name(tool: Any) -> str:
+    info = getattr(tool, "info", None)
+    if info is not None and getattr(info, "name", None):
+        return info.name
+    func = getattr(tool, "__wrapped__", tool)
+    return getattr(func, "__name__", str(tool))
+
+
+def _tool_schema_text(tool: Any) -> str:
+    """Approximate the schema the model sees for a tool: name, docstring and parameters."""
+    func = getattr(tool, "__wrapped__", tool)
+    name = _tool_name(tool)
+    doc = inspect.getdoc(func) or ""
+    try:
+        params = [
+            f"{p.name}: {getattr(p.annotation, '__name__', p.annotation)}"
+            for p in inspect.signature(func).parameters.values()
+            if p.name != "context"
+        ]
+    except (TypeError, ValueError):
+        params = []
+    return f"{name}({', '.join(params)})\n{doc}"
+
+
+@dataclass
+class ToolSpec:
+    """A registered tool plus the keywords that route a turn to it."""
+
+    name: str
+    tool: Any
+    keywords: tuple
+    always: bool = False
+    schema_tokens: int = 0
+    pattern: Optional[re.Pattern] = None
+
+
+class ToolRegistry:
+    """
+    Holds the agent's tools and decides how much instruction text each gets.
+
+    With a realtime model a change only applies after the user turn has been
+    handed to the model, so a dropped tool schema would be missing on exactly
+    the turn that first needs it. Every schema therefore stays exposed, and
+    what shrinks is the instructions: tools mentioned in the last
+    ``recent_turns`` user turns, plus the ``always=True`` ones, keep their full
+    routing rule, response style and examples, and the rest get a one-line
+    rule. Every update restarts the model session, so detail is only dropped
+    when that saves ``min_savings_tokens``.
+    """
+
+    def __init__(self, recent_turns: int = 5, min_savings_tokens: int = 300):
+        self._specs: dict = {}
+        self._history: deque = deque(maxlen=recent_turns)
+        self.recent_turns = recent_turns
+        self.min_savings_tokens = min_savings_tokens
+
+    def register(self, tool: Any, keywords: Iterable[str] = (), always: bool = False) -> None:
+        """Register a tool with the keywords that indicate it is needed."""
+        name = _tool_name(tool)
+        schema = _tool_schema_text(tool)
+        keywords = tuple(k.lower() for k in keywords)
+        pattern = None
+        if keywords:
+            pattern = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")", re.IGNORECASE)
+        self._specs[name] = ToolSpec(
+            name=name,
+            tool=tool,
+            keywords=keywords,
+            always=always,
+            schema_tokens=estimate_tokens(schema),
+            pattern=pattern,
+        )
+
+    @property
+    def names(self) -> list:
+        return list(self._specs)
+
+    def tools(self) -> list:
+        """Every registered tool; all of them are exposed on every turn."""
+        return [spec.tool for spec in self._specs.values()]
+
+    def classify(self, text: str) -> list:
+        """Return the names of the tools whose keywords appear in ``text``."""
+        if not text:
+            return []
+        return [
+            spec.name
+            for spec in self._specs.values()
+            if spec.pattern is not None and spec.pattern.search(text)
+        ]
+
+    def initial_selection(self) -> list:
+        """Tools with full instructions before the user has said anything: all of them."""
+        return self.names
+
+    def select(self, text: str) -> list:
+        """
+        Record a user turn and return the tools that should get full
+        instructions from the next turn on, in registration order.
+        """
+        self._history.append(set(self.classify(text)))
+        if len(self._history) < self.recent_turns:
+            return self.names
+        wanted = set().union(*self._history) | {spec.name for spec in self._specs.values() if spec.always}
+        return [name for name in self._specs if name in wanted]
+
+    def should_update(self, current: Iterable[str], selection: Iterable[str]) -> bool:
+        """
+        Whether switching from ``current`` to ``selection`` is worth a session update.
+        Adding detail always is; dropping it only when it saves ``min_savings_tokens``.
+        """
+        current, selection = set(current), set(selection)
+        if selection == current:
+            return False
+        if not selection <= current:
+            return True
+        saved = self.cost(current)["total_tokens"] - self.cost(selection)["total_tokens"]
+        return saved >= self.min_savings_tokens
+
+    def instructions_for(self, detailed: Iterable[str]) -> str:
+        return build_agent_instruction(self.names, detailed=detailed)
+
+    def cost(self, detailed: Optional[Iterable[str]] = None) -> dict:
+        """Estimated prompt tokens with full instructions for ``detailed`` (all tools when None)."""
+        detailed = self.names if detailed is None else list(detailed)
+        schema_tokens = sum(spec.schema_tokens for spec in self._specs.values())
+        instruction_tokens = estimate_tokens(self.instructions_for(detailed))
+        return {
+            "tools": len(self._specs),
+            "detailed": len([name for name in detailed if name in self._specs]),
+            "schema_tokens": schema_tokens,
+            "instruction_tokens": instruction_tokens,
+            "total_tokens": schema_tokens + instruction_tokens,
+        }
+
+    def log_savings(self, detailed: Iterable[str]) -> None:
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        selected = self.cost(detailed)
+        full = self.cost()
+        logger.info(
+            "Full instructions for %s/%s tools: ~%s of ~%s prompt tokens",
+            selected["detailed"],
+            full["tools"],
+            selected["total_tokens"],
+            full["total_tokens"],
+        )
+
+
+def build_default_registry(recent_turns: int = 5) -> ToolRegistry:
+    """Registry with all of Roku's tools and their routing keywords."""
+    from tools import (
+        answer_general_question,
+        extract_documents,
+        extract_image_text,
+        extract_pdf_text,
+        get_current_datetime,
+        get_current_events,
+        get_election_info,
+        get_weather,
+        query_document,
+        search_music,
+        search_news,
+        search_web,
+        search_youtube,
+        send_email,
+        tell_short_story,
+    )
+
+    registry = ToolRegistry(recent_turns=recent_turns)
+    registry.register(get_weather, ["weather", "temperature", "forecast", "rain", "snow", "sunny", "humid", "wind", "cold", "hot outside"])
+    registry.register(search_web, ["search", "look up", "google", "find", "website"], always=True)
+    registry.register(send_email, ["email", "e-mail", "mail", "send a message", "inbox"])
+    registry.register(extract_pdf_text, ["pdf", "document", "report", "paper", "attachment"])
+    registry.register(query_document, ["pdf", "document", "report", "paper", "page", "section", "chapter", "does it say", "mention"])
+    registry.register(extract_image_text, ["image", "photo", "picture", "screenshot", "scan", "ocr", "png", "jpg", "jpeg", "attachment"])
+    registry.register(extract_documents, ["attachments", "documents", "pdfs", "images", "photos", "screenshots"])
+    registry.register(get_current_datetime, ["time", "date", "day is it", "today", "tomorrow", "yesterday", "clock", "timezone", "what year"], always=True)
+    registry.register(get_current_events, ["current events", "recent", "happening", "latest", "these days", "nowadays"])
+    registry.register(answer_general_question, [], always=True)
+    registry.register(get_election_info, ["election", "vote", "voting", "ballot", "president", "congress", "senate", "who won", "political", "politics", "campaign"])
+    registry.register(tell_short_story, ["story", "stories", "tale", "bedtime", "once upon"])
+    registry.register(search_youtube, ["youtube", "video", "videos", "watch", "clip", "tutorial"])
+    registry.register(search_music, ["music", "song", "songs", "artist", "band", "album", "lyrics", "playlist", "singer"])
+    registry.register(search_news, ["news", "headline", "headlines", "breaking", "latest", "updates"])
+    return registry
@@ -14,12 +14,71 @@ from PIL import Image
 import pytesseract
 from datetime import datetime
 import pytz
+from document_index import DocumentIndex, DocumentStore
+from log_pipeline import bind_tool_call
+from prefetch import PrefetchScheduler
+
+logger = logging.getLogger("roku.tools")
 
 # Optional: allow configuring Tesseract executable via env var (useful on Windows)
 _tess_cmd = os.getenv("TESSERACT_CMD")
 if _tess_cmd:
     pytesseract.pytesseract.tesseract_cmd = _tess_cmd
 
+# Indexed documents, so follow-up questions don't re-extract the whole file
+_documents = DocumentStore()
+# Indexes still being built in the background, by source
+_indexing: dict = {}
+
+class _WeatherUnavailable(Exception):
+    pass
+
+
+async def _fetch_weather(city: str) -> str:
+    """Fetch the current weather for a city from wttr.in. Raises on failure."""
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.get(f"https://wttr.in/{city}?format=j1")
+
+        if response.status_code == 200:
+            weather_data = response.json()
+
+            # Extract current weather information
+            current = weather_data.get('current_condition', [{}])[0]
+
+            # Get temperature, condition, and humidity
+            temp_c = current.get('temp_C', 'N/A')
+            temp_f = current.get('temp_F', 'N/A')
+            condition = current.get('weatherDesc', [{}])[0].get('value', 'Unknown')
+            humidity = current.get('humidity', 'N/A')
+            wind_speed = current.get('windspeedKmph', 'N/A')
+            feels_like = current.get('FeelsLikeC', 'N/A')
+
+            # Format the response
+            return f"Current weather in {city}: {temp_c}°C ({temp_f}°F), {condition}. Feels like {feels_like}°C. Humidity: {humidity}%. Wind: {wind_speed} km/h."
+
+        # Fallback to simple format if detailed fails
+        simple_response = await client.get(f"https://wttr.in/{city}?format=3")
+        if simple_response.status_code == 200:
+            return simple_response.text.strip()
+        raise _WeatherUnavailable(response.status_code)
+
+
+async def _web_search(query: str) -> str:
+    """Run a DuckDuckGo search off the event loop."""
+    return await asyncio.to_thread(DuckDuckGoSearchRun().run, query)
+
+
+# Upstream results are cached briefly and the most requested ones are kept warm
+# in the background (see prefetch.py); the scheduler is started by the agent.
+# The cache file is shared by every job process of the worker.
+prefetcher = PrefetchScheduler(
+    path=os.getenv("ROKU_PREFETCH_DB", os.path.join(".roku_cache", "prefetch.sqlite3")),
+    budget_per_hour=int(os.getenv("ROKU_PREFETCH_BUDGET", "120")),
+)
+prefetcher.register("weather", _fetch_weather, ttl=600, rate_per_minute=30)
+prefetcher.register("search", _web_search, ttl=300, rate_per_minute=10)
+
+
 @function_tool()
 async def get_weather(
     context: RunContext,  # type: ignore
@@ -27,48 +86,23 @@ async def get_weather(
     """
     Get the current weather for a given city with detailed information.
     """
+    bind_tool_call(context, "get_weather")
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"https://wttr.in/{city}?format=j1")
-
-            if response.status_code == 200:
-                weather_data = response.json()
-
-                # Extract current weather information
-                current = weather_data.get('current_condition', [{}])[0]
-                location = weather_data.get('nearest_area', [{}])[0]
-
-                # Get temperature, condition, and humidity
-                temp_c = current.get('temp_C', 'N/A')
-                temp_f = current.get('temp_F', 'N/A')
-                condition = current.get('weatherDesc', [{}])[0].get('value', 'Unknown')
-                humidity = current.get('humidity', 'N/A')
-                wind_speed = current.get('windspeedKmph', 'N/A')
-                feels_like = current.get('FeelsLikeC', 'N/A')
-
-                # Format the response
-                weather_info = f"Current weather in {city}: {temp_c}°C ({temp_f}°F), {condition}. Feels like {feels_like}°C. Humidity: {humidity}%. Wind: {wind_speed} km/h."
-
-                logging.info(f"Weather for {city}: {weather_info}")
-                return weather_info
-
-            else:
-                # Fallback to simple format if detailed fails
-                simple_response = await client.get(f"https://wttr.in/{city}?format=3")
-                if simple_response.status_code == 200:
-                    return simple_response.text.strip()
-                else:
-                    logging.error(f"Failed to get weather for {city}: {response.status_code}")
-                    return f"Could not retrieve weather for {city}. Please check the city name and try again."
+        weather_info = await prefetcher.fetch("weather", city)
+        logger.info("Weather for %s: %s", city, weather_info)
+        return weather_info
 
+    except _WeatherUnavailable as e:
+        logger.error("Failed to get weather for %s: %s", city, e)
+        return f"Could not retrieve weather for {city}. Please check the city name and try again."
     except httpx.TimeoutException:
-        logging.error(f"Timeout getting weather for {city}")
+        logger.error("Timeout getting weather for %s", city)
         return f"Sorry, the weather service is taking too long to respond for {city}."
     except httpx.RequestError as e:
-        logging.error(f"Request error for {city}: {e}")
+        logger.error("Request error for %s: %s", city, e)
         return f"Network error while getting weather for {city}. Please check your internet connection."
     except Exception as e:
-        logging.error(f"Error retrieving weather for {city}: {e}")
+        logger.error("Error retrieving weather for %s: %s", city, e)
         return f"An error occurred while retrieving weather for {city}. Please try again." 
 
 @function_tool()
@@ -84,6 +118,7 @@ async def search_news(
         query: The news search query (topic, "breaking news", "latest", etc.)
         max_results: Maximum number of results to return (default: 5)
     """
+    bind_tool_call(context, "search_news")
     try:
         # Search for news-related content
         if "latest" in query.lower() or "news" in query.lower():
@@ -92,7 +127,7 @@ async def search_news(
             news_search_query = f"news {query} latest updates"
 
         # Use DuckDuckGo to search for news
-        results = await asyncio.to_thread(DuckDuckGoSearchRun().run, news_search_query)
+        results = await prefetcher.fetch("search", news_search_query)
 
         # Process results to extract news information
         if results and len(results) > 50:
@@ -103,11 +138,11 @@ async def search_news(
         else:
             formatted_results = f"I searched for news about '{query}' but couldn't find specific results. Try searching for 'latest news' or a specific topic!"
 
-        logging.info(f"News search results for '{query}': {results}")
+        logger.info("News search results for '%s': %s", query, results)
         return formatted_results
 
     except Exception as e:
-        logging.error(f"Error searching for news '{query}': {e}")
+        logger.error("Error searching for news '%s': %s", query, e)
         return f"Oh dear, I had trouble getting the latest news for '{query}'. News search might be having issues right now. Would you like me to try a different topic?"
 
 @function_tool()
@@ -117,17 +152,18 @@ async def search_web(
     """
     Search the web using DuckDuckGo and return concise results.
     """
+    bind_tool_call(context, "search_web")
     try:
-        results = await asyncio.to_thread(DuckDuckGoSearchRun().run, query)
+        results = await prefetcher.fetch("search", query)
 
         # Truncate results if too long for voice response
         if len(results) > 500:
             results = results[:500] + "..."
 
-        logging.info(f"Search results for '{query}': {results}")
+        logger.info("Search results for '%s': %s", query, results)
         return results
     except Exception as e:
-        logging.error(f"Error searching the web for '{query}': {e}")
+        logger.error("Error searching the web for '%s': %s", query, e)
         return f"An error occurred while searching the web for '{query}'. Please try again."    
 
 @function_tool()    
@@ -147,6 +183,7 @@ async def send_email(
         message: Email body content
         cc_email: Optional CC email address
     """
+    bind_tool_call(context, "send_email")
     try:
         # Gmail SMTP configuration
         smtp_server = "smtp.gmail.com"
@@ -157,7 +194,7 @@ async def send_email(
         gmail_password = os.getenv("GMAIL_APP_PASSWORD")  # Use App Password, not regular password
 
         if not gmail_user or not gmail_password:
-            logging.error("Gmail credentials not found in environment variables")
+            logger.error("Gmail credentials not found in environment variables")
             return "Email sending failed: Gmail credentials not configured."
 
         # Create message
@@ -188,31 +225,119 @@ async def send_email(
             password=gmail_password,
         )
 
-        logging.info(f"Email sent successfully to {to_email}")
+        logger.info("Email sent successfully to %s", to_email)
         return f"Email sent successfully to {to_email}"
 
     except aiosmtplib.errors.SMTPAuthenticationError:
-        logging.error("Gmail authentication failed")
+        logger.error("Gmail authentication failed")
         return "Email sending failed: Authentication error. Please check your Gmail credentials."
     except aiosmtplib.SMTPException as e:
-        logging.error(f"SMTP error occurred: {e}")
+        logger.error("SMTP error occurred: %s", e)
         return f"Email sending failed: SMTP error - {str(e)}"
     except Exception as e:
-        logging.error(f"Error sending email: {e}")
+        logger.error("Error sending email: %s", e)
         return f"An error occurred while sending email: {str(e)}"
 
 
-async def _read_source_bytes(source: str) -> bytes:
-    """Fetch bytes from a URL (http/https) or read from a local file path asynchronously."""
+class _BudgetExceeded(Exception):
+    pass
+
+
+class _Budget:
+    """A shared byte allowance drawn down by the downloads of one batch."""
+
+    def __init__(self, total: int):
+        self.remaining = total
+
+    def take(self, amount: int) -> bool:
+        """Take exactly ``amount``, or nothing if not enough is left."""
+        if amount > self.remaining:
+            return False
+        self.remaining -= amount
+        return True
+
+
+async def _read_source_bytes(source: str, budget: Optional[_Budget] = None) -> bytes:
+    """
+    Fetch bytes from a URL (http/https) or read from a local file path asynchronously.
+    With a ``budget``, downloads are streamed and abort with _BudgetExceeded once it runs out.
+    """
     if source.startswith("http://") or source.startswith("https://"):
         async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.get(source)
-            resp.raise_for_status()
-            return resp.content
+            if budget is None:
+                resp = await client.get(source)
+                resp.raise_for_status()
+                return resp.content
+            async with client.stream("GET", source) as resp:
+                resp.raise_for_status()
+                chunks: list[bytes] = []
+                async for chunk in resp.aiter_bytes():
+                    if not budget.take(len(chunk)):
+                        raise _BudgetExceeded()
+                    chunks.append(chunk)
+                return b"".join(chunks)
     # Local file path
+    if budget is not None:
+        size = await asyncio.to_thread(os.path.getsize, source)
+        if not budget.take(size):
+            raise _BudgetExceeded()
     return await asyncio.to_thread(lambda: open(source, "rb").read())
 
 
+_IMAGE_SIGNATURES = (
+    b"\x89PNG\r\n\x1a\n",
+    b"\xff\xd8\xff",  # JPEG
+    b"GIF87a",
+    b"GIF89a",
+    b"II*\x00",  # TIFF, little-endian
+    b"MM\x00*",  # TIFF, big-endian
+)
+
+
+# Sizes of the known BMP info headers (BITMAPCOREHEADER through BITMAPV5HEADER)
+_BMP_HEADER_SIZES = (12, 16, 40, 52, 56, 64, 108, 124)
+
+
+def _is_bmp(data: bytes) -> bool:
+    """"BM" alone matches plain text, so also check the reserved fields and the info header size."""
+    return (
+        len(data) >= 18
+        and data[:2] == b"BM"
+        and data[6:10] == b"\x00\x00\x00\x00"
+        and int.from_bytes(data[14:18], "little") in _BMP_HEADER_SIZES
+    )
+
+
+def _detect_document_type(data: bytes) -> Optional[str]:
+    """Return "pdf", "image" or None based on the file's magic bytes."""
+    if b"%PDF-" in data[:1024]:
+        return "pdf"
+    if data.startswith(_IMAGE_SIGNATURES) or _is_bmp(data) or (data[:4] == b"RIFF" and data[8:12] == b"WEBP"):
+        return "image"
+    return None
+
+
+async def _extract_pdf_pages(data: bytes, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> list[str]:
+    """
+    Extract the text of each page of a PDF, up to ``max_pages`` pages. With
+    ``max_chars``, stops after the first page that takes the text past it.
+    """
+    reader = await asyncio.to_thread(lambda: PdfReader(BytesIO(data)))
+    num_pages = len(reader.pages)
+    pages_to_read = num_pages if max_pages is None else min(max_pages, num_pages)
+
+    pages: list[str] = []
+    chars = 0
+    for i in range(pages_to_read):
+        page = reader.pages[i]
+        page_text = await asyncio.to_thread(page.extract_text)
+        pages.append(page_text or "")
+        chars += len(pages[-1])
+        if max_chars is not None and chars > max_chars:
+            break
+    return pages
+
+
 @function_tool()
 async def extract_pdf_text(
     context: RunContext,  # type: ignore
@@ -228,37 +353,106 @@ async def extract_pdf_text(
         max_pages: Optional limit of pages to process starting from page 1.
         max_chars: Truncate extracted text to this length.
     """
+    bind_tool_call(context, "extract_pdf_text")
     try:
         data = await _read_source_bytes(source)
-        reader = await asyncio.to_thread(lambda: PdfReader(BytesIO(data)))
-        num_pages = len(reader.pages)
+        pages = await _extract_pdf_pages(data, max_pages)
 
-        text_parts: list[str] = []
-        pages_to_read = num_pages if max_pages is None else min(max_pages, num_pages)
-
-        for i in range(pages_to_read):
-            page = reader.pages[i]
-            page_text = await asyncio.to_thread(page.extract_text)
-            if page_text:
-                text_parts.append(page_text)
-
-        extracted = "\n".join(text_parts).strip()
+        extracted = "\n".join(page for page in pages if page).strip()
         if not extracted:
             return (
                 "No selectable text found in the PDF. It may be a scanned document. "
                 "Try using image OCR or provide a higher-quality source."
             )
 
+        # Index the whole document so follow-up questions can use query_document
+        if max_pages is None:
+            _index_in_background(source, pages)
+
         if len(extracted) > max_chars:
             extracted = extracted[:max_chars] + "\n... [truncated]"
 
-        logging.info(f"Extracted PDF text from '{source}' ({pages_to_read} page(s))")
+        logger.info("Extracted PDF text from '%s' (%s page(s))", source, len(pages))
         return extracted
     except Exception as e:
-        logging.error(f"Error extracting PDF text from '{source}': {e}")
+        logger.error("Error extracting PDF text from '%s': %s", source, e)
         return f"Failed to extract text from PDF: {str(e)}"
 
 
+def _index_in_background(source: str, pages: list) -> None:
+    """Build the document's index without making the current tool call wait for it."""
+    if source in _documents or source in _indexing:
+        return
+
+    async def _build() -> Optional[DocumentIndex]:
+        try:
+            index = await asyncio.to_thread(DocumentIndex, pages)
+            _documents.put(source, index)
+            logger.info("Indexed PDF '%s' (%s page(s), %s passage(s))", source, index.num_pages, len(index.passages))
+            return index
+        except Exception as e:
+            logger.error("Error indexing PDF '%s': %s", source, e)
+            return None
+        finally:
+            _indexing.pop(source, None)
+
+    _indexing[source] = asyncio.create_task(_build())
+
+
+@function_tool()
+async def query_document(
+    context: RunContext,  # type: ignore
+    source: str,
+    question: str,
+    max_chars: int = 1500,
+) -> str:
+    """
+    Answer a question about a PDF using only its most relevant passages, with page numbers.
+    The document is extracted and indexed on first use, so follow-up questions about the
+    same document are fast. Use this for specific questions about long documents.
+
+    Args:
+        source: HTTP(S) URL or local file path to the PDF.
+        question: What the user wants to know about the document.
+        max_chars: Maximum characters of passages to return.
+    """
+    bind_tool_call(context, "query_document")
+    try:
+        index = _documents.get(source)
+        if index is None and source in _indexing:
+            index = await asyncio.shield(_indexing[source])
+        if index is None:
+            data = await _read_source_bytes(source)
+            pages = await _extract_pdf_pages(data)
+            index = await asyncio.to_thread(DocumentIndex, pages)
+            _documents.put(source, index)
+            logger.info("Indexed PDF '%s' (%s page(s), %s passage(s))", source, index.num_pages, len(index.passages))
+
+        if not index.passages:
+            return (
+                "No selectable text found in the PDF. It may be a scanned document. "
+                "Try using image OCR or provide a higher-quality source."
+            )
+
+        answer = index.answer(question, max_chars=max_chars)
+        if not answer:
+            return f"I couldn't find anything about '{question}' in that document ({index.num_pages} pages)."
+
+        logger.info("Answered '%s' from '%s' (len=%s)", question, source, len(answer))
+        return answer
+    except Exception as e:
+        logger.error("Error querying PDF '%s' for '%s': %s", source, question, e)
+        return f"Failed to search the PDF: {str(e)}"
+
+
+async def _ocr_image(data: bytes, lang: str = "eng") -> str:
+    def _run() -> str:
+        image = Image.open(BytesIO(data)).convert("L")  # grayscale improves OCR
+        return pytesseract.image_to_string(image, lang=lang)
+
+    return (await asyncio.to_thread(_run)).strip()
+
+
 @function_tool()
 async def extract_image_text(
     context: RunContext,  # type: ignore
@@ -275,24 +469,132 @@ async def extract_image_text(
         source: HTTP(S) URL or local file path to the image.
         lang: Language code for OCR (default 'eng').
     """
+    bind_tool_call(context, "extract_image_text")
     try:
         data = await _read_source_bytes(source)
-        image = Image.open(BytesIO(data)).convert("L")  # grayscale improves OCR
-
-        text = await asyncio.to_thread(pytesseract.image_to_string, image, lang=lang)
-        text = text.strip()
+        text = await _ocr_image(data, lang)
         if not text:
             return "No text detected in the image."
 
-        logging.info(f"Extracted image text from '{source}' (len={len(text)})")
+        logger.info("Extracted image text from '%s' (len=%s)", source, len(text))
         return text
     except Exception as e:
-        logging.error(f"Error extracting image text from '{source}': {e}")
+        logger.error("Error extracting image text from '%s': %s", source, e)
         return (
             "Failed to extract text from image. Ensure the file is a supported image and "
             "that Tesseract OCR is installed."
         )
 
+
+# Server-side limits for one extract_documents call
+_BATCH_MAX_SOURCES = 10
+_BATCH_MAX_CONCURRENCY = 4
+_BATCH_MAX_BYTES = 50_000_000
+_BATCH_MAX_CHARS = 8000
+_BATCH_SOURCE_TIMEOUT = 30.0
+
+
+def _fair_shares(lengths: list[int], total: int) -> list[int]:
+    """
+    Split ``total`` characters between texts of the given lengths: each gets an
+    equal share, and what short texts don't use is handed on to longer ones.
+    """
+    shares = [0] * len(lengths)
+    remaining = total
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for position, i in enumerate(order):
+        shares[i] = min(lengths[i], remaining // (len(lengths) - position))
+        remaining -= shares[i]
+    return shares
+
+
+@function_tool()
+async def extract_documents(
+    context: RunContext,  # type: ignore
+    sources: list[str],
+    lang: str = "eng",
+) -> str:
+    """
+    Extract text from several PDFs and images at once, in a single call.
+    Use this instead of calling extract_pdf_text or extract_image_text repeatedly
+    when the user shares more than one attachment. The file type is detected automatically.
+
+    Args:
+        sources: HTTP(S) URLs or local file paths of the PDFs and images.
+        lang: Language code for image OCR (default 'eng').
+    """
+    bind_tool_call(context, "extract_documents")
+    if not sources:
+        return "No documents were provided."
+    extra = sources[_BATCH_MAX_SOURCES:]
+    sources = sources[:_BATCH_MAX_SOURCES]
+
+    semaphore = asyncio.Semaphore(_BATCH_MAX_CONCURRENCY)
+    byte_budget = _Budget(_BATCH_MAX_BYTES)
+    labels: list[str] = [""] * len(sources)
+    texts: list[str] = [""] * len(sources)
+
+    async def _extract(i: int, source: str) -> None:
+        data = await _read_source_bytes(source, byte_budget)
+        kind = _detect_document_type(data)
+        if kind == "pdf":
+            # No source can return more than the whole batch's limit, so stop reading there
+            pages = await _extract_pdf_pages(data, max_chars=_BATCH_MAX_CHARS)
+            texts[i] = "\n".join(page for page in pages if page).strip()
+            if sum(len(page) for page in pages) > _BATCH_MAX_CHARS:
+                labels[i] = f"PDF, first {len(pages)} page(s)"
+            else:
+                labels[i] = f"PDF, {len(pages)} page(s)"
+                _index_in_background(source, pages)
+        elif kind == "image":
+            texts[i] = await _ocr_image(data, lang)
+            labels[i] = "image"
+        else:
+            labels[i] = "skipped: not a PDF or a supported image"
+            return
+        if not texts[i]:
+            labels[i] += ": no text found"
+
+    async def _extract_one(i: int, source: str) -> None:
+        async with semaphore:
+            try:
+                await asyncio.wait_for(_extract(i, source), _BATCH_SOURCE_TIMEOUT)
+            except _BudgetExceeded:
+                labels[i] = "skipped: batch byte limit reached"
+                return
+            except asyncio.TimeoutError:
+                logger.warning("Timed out extracting '%s' in batch", source)
+                labels[i] = f"skipped: took longer than {_BATCH_SOURCE_TIMEOUT:.0f}s"
+                texts[i] = ""
+                return
+            except Exception as e:
+                logger.error("Error extracting '%s' in batch: %s", source, e)
+                labels[i] = f"failed: {str(e)}"
+
+    await asyncio.gather(*(_extract_one(i, source) for i, source in enumerate(sources)))
+
+    # Every source gets its share of the character limit, so one large PDF
+    # can't crowd the others out of this round-trip
+    shares = _fair_shares([len(text) for text in texts], _BATCH_MAX_CHARS)
+    results = []
+    for i, (source, label, text, share) in enumerate(zip(sources, labels, texts, shares), start=1):
+        if text:
+            suffix = "\n... [truncated]" if share < len(text) else ""
+            results.append(f"[{i}] {source}: {label}\n{text[:share]}{suffix}")
+        else:
+            results.append(f"[{i}] {source}: {label}")
+    if extra:
+        results.append(f"Not processed ({len(extra)} more than the {_BATCH_MAX_SOURCES}-source limit): {', '.join(extra)}")
+
+    logger.info(
+        "Extracted %s source(s) in one batch (%s bytes read, %s chars returned)",
+        len(sources),
+        _BATCH_MAX_BYTES - byte_budget.remaining,
+        sum(shares),
+    )
+    return "\n\n".join(results)
+
+
 @function_tool()
 async def get_current_datetime(
     context: RunContext,  # type: ignore
@@ -303,6 +605,7 @@ async def get_current_datetime(
     Args:
         timezone: The timezone to get time for (default: UTC)
     """
+    bind_tool_call(context, "get_current_datetime")
     try:
         # Get current UTC time
         utc_now = datetime.utcnow()
@@ -323,11 +626,11 @@ async def get_current_datetime(
         
         datetime_info = f"Today is {date_str}. The current time is {time_str} {timezone_str}."
         
-        logging.info(f"Current datetime: {datetime_info}")
+        logger.info("Current datetime: %s", datetime_info)
         return datetime_info
         
     except Exception as e:
-        logging.error(f"Error getting current datetime: {e}")
+        logger.error("Error getting current datetime: %s", e)
         return "I'm having trouble getting the current date and time. Please try again."
 
 @function_tool()
@@ -340,6 +643,7 @@ async def get_current_events(
     Args:
         topic: The topic to search for (e.g., "2024 US elections", "current events")
     """
+    bind_tool_call(context, "get_current_events")
     try:
         # Use web search to get current information
         if "election" in topic.lower() or "elections" in topic.lower():
@@ -347,17 +651,17 @@ async def get_current_events(
         else:
             search_query = f"latest news {topic} 2024 2025"
             
-        results = await asyncio.to_thread(DuckDuckGoSearchRun().run, search_query)
+        results = await prefetcher.fetch("search", search_query)
         
         # Truncate results if too long for voice response
         if len(results) > 300:
             results = results[:300] + "..."
         
-        logging.info(f"Current events for '{topic}': {results}")
+        logger.info("Current events for '%s': %s", topic, results)
         return results
         
     except Exception as e:
-        logging.error(f"Error getting current events for '{topic}': {e}")
+        logger.error("Error getting current events for '%s': %s", topic, e)
         return f"I'm having trouble getting current information about {topic}. Please try again."
 
 @function_tool()
@@ -369,10 +673,11 @@ async def answer_general_question(
     Answer general knowledge questions and provide engaging, friendly responses.
     This tool is for open-ended questions, trivia, explanations, and casual conversation.
     """
+    bind_tool_call(context, "answer_general_question")
     try:
         # Use web search for factual questions
         if any(keyword in question.lower() for keyword in ["what is", "who is", "how does", "why does", "when did", "where is"]):
-            search_results = await asyncio.to_thread(DuckDuckGoSearchRun().run, question)
+            search_results = await prefetcher.fetch("search", question)
             if len(search_results) > 400:
                 search_results = search_results[:400] + "..."
             return f"Oh, what a great question! {search_results}"
@@ -400,13 +705,13 @@ async def answer_general_question(
 
         else:
             # For other general questions, use search but make it engaging
-            search_results = await asyncio.to_thread(DuckDuckGoSearchRun().run, question)
+            search_results = await prefetcher.fetch("search", question)
             if len(search_results) > 400:
                 search_results = search_results[:400] + "..."
             return f"That's an interesting question! {search_results}"
 
     except Exception as e:
-        logging.error(f"Error answering general question '{question}': {e}")
+        logger.error("Error answering general question '%s': %s", question, e)
         return f"Oh dear, I had a little trouble with that question, but I'd love to try again! Could you rephrase it for me?"
 
 @function_tool()
@@ -420,6 +725,7 @@ async def tell_short_story(
     Args:
         theme: The theme or topic for the story (e.g., "adventure", "friendship", "magic")
     """
+    bind_tool_call(context, "tell_short_story")
     try:
         # Story templates based on themes
         story_templates = {
@@ -444,7 +750,7 @@ async def tell_short_story(
         return f"Oh, I'd love to tell you a story! Here's a fun one about {theme}: {story}"
 
     except Exception as e:
-        logging.error(f"Error generating short story for theme '{theme}': {e}")
+        logger.error("Error generating short story for theme '%s': %s", theme, e)
         return f"Oh dear, I had a little trouble creating a story about {theme}, but I'd be happy to try again with a different theme! What kind of story would you like to hear?"
 
 @function_tool()
@@ -460,12 +766,13 @@ async def search_music(
         query: The music search query (song name, artist, genre, etc.)
         max_results: Maximum number of results to return (default: 5)
     """
+    bind_tool_call(context, "search_music")
     try:
         # Search for music-related content
         music_search_query = f"music {query} song lyrics artist"
 
         # Use DuckDuckGo to search for music information
-        results = await asyncio.to_thread(DuckDuckGoSearchRun().run, music_search_query)
+        results = await prefetcher.fetch("search", music_search_query)
 
         # Process results to extract music information
         if results and len(results) > 50:
@@ -476,11 +783,11 @@ async def search_music(
         else:
             formatted_results = f"I searched for music related to '{query}' but couldn't find specific results. Try searching for a specific song, artist, or genre!"
 
-        logging.info(f"Music search results for '{query}': {results}")
+        logger.info("Music search results for '%s': %s", query, results)
         return formatted_results
 
     except Exception as e:
-        logging.error(f"Error searching for music '{query}': {e}")
+        logger.error("Error searching for music '%s': %s", query, e)
         return f"Oh dear, I had trouble searching for music related to '{query}'. Music search might be having issues right now. Would you like me to try a different search?"
 
 @function_tool()
@@ -496,12 +803,13 @@ async def search_youtube(
         query: The search query for YouTube
         max_results: Maximum number of results to return (default: 5)
     """
+    bind_tool_call(context, "search_youtube")
     try:
         # Use DuckDuckGo to search for YouTube results
         youtube_search_query = f"site:youtube.com {query}"
 
         # Search using the existing DuckDuckGo tool
-        results = await asyncio.to_thread(DuckDuckGoSearchRun().run, youtube_search_query)
+        results = await prefetcher.fetch("search", youtube_search_query)
 
         # Process results to extract YouTube video information
         if results and len(results) > 50:
@@ -512,11 +820,11 @@ async def search_youtube(
         else:
             formatted_results = f"I searched YouTube for '{query}' but couldn't find specific video results. Try rephrasing your search or being more specific!"
 
-        logging.info(f"YouTube search results for '{query}': {results}")
+        logger.info("YouTube search results for '%s': %s", query, results)
         return formatted_results
 
     except Exception as e:
-        logging.error(f"Error searching YouTube for '{query}': {e}")
+        logger.error("Error searching YouTube for '%s': %s", query, e)
         return f"Oh dear, I had trouble searching YouTube for '{query}'. The YouTube search feature might be having issues right now. Would you like me to try a different search?"
 
 @function_tool()
@@ -529,6 +837,7 @@ async def get_election_info(
     Args:
         query: The election-related question
     """
+    bind_tool_call(context, "get_election_info")
     try:
         # Handle common election questions with context
         current_year = datetime.now().year
@@ -540,7 +849,7 @@ async def get_election_info(
             else:
                 # We're past 2025, search for historical results
                 search_query = f"US elections 2025 results presidential congressional"
-                results = await asyncio.to_thread(DuckDuckGoSearchRun().run, search_query)
+                results = await prefetcher.fetch("search", search_query)
                 if len(results) > 300:
                     results = results[:300] + "..."
                 return f"Roger Boss. {results}"
@@ -556,14 +865,14 @@ async def get_election_info(
         else:
             search_query = f"{presidential_year} US election results {query} winner outcome"
 
-        results = await asyncio.to_thread(DuckDuckGoSearchRun().run, search_query)
+        results = await prefetcher.fetch("search", search_query)
 
         if len(results) > 500:
             results = results[:500] + "..."
 
-        logging.info(f"Election info for '{query}': {results}")
+        logger.info("Election info for '%s': %s", query, results)
         return f"Roger Boss. {results}"
 
     except Exception as e:
-        logging.error(f"Error getting election info for '{query}': {e}")
+        logger.error("Error getting election info for '%s': %s", query, e)
         return f"I'm having trouble getting election information about {query}. Please try again."